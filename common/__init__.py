@@ -1,3 +1,11 @@
-from . import finance_tool, time_tool, search_tool
+import importlib
 
-__all__ = ['finance_tool', 'time_tool', 'search_tool']
\ No newline at end of file
+__all__ = ['finance_tool', 'time_tool', 'search_tool']
+
+
+def __getattr__(name):
+    # 按需加载工具模块：finance_tool/search_tool 导入时就要求配置密钥，
+    # 只用到 router 等本地模块时（如离线评估）不应被它们拦住
+    if name in __all__:
+        return importlib.import_module(f"{__name__}.{name}")
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
@@ -1,47 +1,185 @@
+from google.adk.models.base_llm import BaseLlm
 from google.adk.models.lite_llm import LiteLlm
+from google.adk.models.llm_request import LlmRequest
+from google.adk.models.llm_response import LlmResponse
 from dotenv import load_dotenv
+from typing import AsyncGenerator, Callable, Dict, Optional
+import logging
 import os
 
 # 加载环境变量
 load_dotenv(override=True)
 
-def setup_siliconflow_model():
+logger = logging.getLogger(__name__)
+
+# 模型档位：fast 用于路由、对话、整合等轻量步骤，strong 用于深度分析
+FAST = "fast"
+STRONG = "strong"
+
+# 各智能体默认使用的档位，未列出的智能体使用 strong
+# 可通过环境变量 AGENT_MODEL_PROFILES 覆盖，例如 "金融分析团队负责人=strong,投资建议整合=fast"
+AGENT_PROFILES: Dict[str, str] = {
+    # multi-agent
+    "金融分析团队负责人": FAST,
+    "股票分析专家": STRONG,
+    "基金分析专家": STRONG,
+    "风险评估专家": STRONG,
+    "市场分析专家": STRONG,
+    "市场环境扫描": STRONG,
+    "投资机会识别": STRONG,
+    "风险评估": STRONG,
+    "投资建议整合": FAST,
+    # promt_agent
+    "金融提示词优化专家": FAST,
+    # litellm-agent
+    "金融分析专家": STRONG,
+}
+
+# 各提供者 fast 档位的默认模型，strong 档位沿用原有的 *_MODEL 配置
+# DeepSeek 官方接口没有更小的对话模型，需通过 DEEPSEEK_FAST_MODEL 显式指定
+FAST_MODEL_DEFAULTS = {
+    "siliconflow": "Qwen/Qwen2.5-7B-Instruct",
+    "tencent": "hunyuan-turbos-latest",
+}
+
+
+def _model_env(prefix: str, profile: str, default: str) -> str:
+    """读取指定档位的模型名，fast 档位读取 <PREFIX>_FAST_MODEL
+
+    fast 档位未配置或与 strong 档位相同时沿用 strong 档位的模型。
+    """
+    strong_model = os.getenv(f"{prefix}_MODEL", default)
+    if profile == FAST:
+        fast_model = os.getenv(f"{prefix}_FAST_MODEL", FAST_MODEL_DEFAULTS.get(prefix.lower()))
+        if fast_model and fast_model != strong_model:
+            return fast_model
+        logger.warning(f"{prefix}_FAST_MODEL 未设置或与 {prefix}_MODEL 相同，fast 档位沿用 {strong_model}")
+    return strong_model
+
+
+def setup_siliconflow_model(profile: str = STRONG):
     """配置SiliconFlow模型"""
     api_key = os.getenv("SILICONFLOW_API_KEY")
     if api_key is None:
         raise ValueError("SILICONFLOW_API_KEY 环境变量未设置")
     os.environ["OPENAI_API_KEY"] = api_key
     os.environ["OPENAI_BASE_URL"] = "https://api.siliconflow.cn"
-    model_name = os.getenv("SILICONFLOW_MODEL", "Pro/deepseek-ai/DeepSeek-V3")
+    model_name = _model_env("SILICONFLOW", profile, "Pro/deepseek-ai/DeepSeek-V3")
     return LiteLlm(model=f"openai/{model_name}")
 
-def setup_deepseek_model():
+def setup_deepseek_model(profile: str = STRONG):
     """配置DeepSeek模型"""
     api_key = os.getenv("DEEPSEEK_API_KEY")
     if api_key is None:
         raise ValueError("DEEPSEEK_API_KEY 环境变量未设置")
     os.environ["OPENAI_API_KEY"] = api_key
     os.environ["OPENAI_BASE_URL"] = "https://api.deepseek.com"
-    model_name = os.getenv("DEEPSEEK_MODEL", "deepseek-chat")
+    model_name = _model_env("DEEPSEEK", profile, "deepseek-chat")
     return LiteLlm(model=f"openai/{model_name}")
 
-def setup_tencent_model():
+def setup_tencent_model(profile: str = STRONG):
     """配置腾讯模型"""
     api_key = os.getenv("TENCENT_API_KEY")
     if api_key is None:
         raise ValueError("TENCENT_API_KEY 环境变量未设置")
     os.environ["OPENAI_API_KEY"] = api_key
     os.environ["OPENAI_BASE_URL"] = os.getenv("TENCENT_BASE_URL","https://api.hunyuan.cloud.tencent.com/v1")
-    model_name = os.getenv("TENCENT_MODEL", "hunyuan-t1-latest")
+    model_name = _model_env("TENCENT", profile, "hunyuan-t1-latest")
     return LiteLlm(model=f"openai/{model_name}")
 
-def setup_model():
+
+def get_agent_profile(agent_name: Optional[str], tiering: Optional[bool] = None) -> str:
+    """获取智能体的模型档位
+
+    不分档时所有智能体统一使用 strong 档位，即原来的单模型配置。
+
+    Args:
+        agent_name: 智能体名称
+        tiering: 是否分档，为空时读取 MODEL_TIERING（默认 on）
+    """
+    if tiering is None:
+        tiering = os.getenv("MODEL_TIERING", "on").lower() != "off"
+    if not tiering or agent_name is None:
+        return STRONG
+    overrides = {}
+    for item in os.getenv("AGENT_MODEL_PROFILES", "").split(","):
+        if "=" in item:
+            name, profile = item.split("=", 1)
+            overrides[name.strip()] = profile.strip().lower()
+    profile = overrides.get(agent_name, AGENT_PROFILES.get(agent_name, STRONG))
+    if profile not in (FAST, STRONG):
+        raise ValueError(f"不支持的模型档位: {profile}")
+    return profile
+
+
+def validate_response(llm_request: LlmRequest, llm_response: LlmResponse) -> bool:
+    """校验小模型的回复：不能报错、不能为空、不能调用不存在的工具"""
+    if llm_response.error_code or not llm_response.content or not llm_response.content.parts:
+        return False
+    for part in llm_response.content.parts:
+        if part.function_call and part.function_call.name not in llm_request.tools_dict:
+            return False
+    return any(part.function_call or (part.text or "").strip() for part in llm_response.content.parts)
+
+
+class EscalatingLlm(BaseLlm):
+    """先用小模型回答，校验不通过时升级到大模型重新生成
+
+    小模型的回复要完整校验后才能返回，因此小模型一侧不做流式输出，Web UI 中这些智能体的回复会整段出现。
+    """
+
+    fast: BaseLlm
+    strong: BaseLlm
+    validator: Callable[[LlmRequest, LlmResponse], bool] = validate_response
+
+    async def generate_content_async(
+        self, llm_request: LlmRequest, stream: bool = False
+    ) -> AsyncGenerator[LlmResponse, None]:
+        responses = []
+        try:
+            async for llm_response in self.fast.generate_content_async(llm_request, stream=False):
+                responses.append(llm_response)
+        except Exception as e:
+            logger.warning(f"{self.fast.model} 调用失败，升级到 {self.strong.model}: {e}")
+            responses = []
+
+        if responses and all(self.validator(llm_request, r) for r in responses):
+            for llm_response in responses:
+                yield llm_response
+            return
+
+        if responses:
+            logger.info(f"{self.fast.model} 的回复未通过校验，升级到 {self.strong.model}")
+        async for llm_response in self.strong.generate_content_async(llm_request, stream=stream):
+            yield llm_response
+
+
+def _setup_provider_model(profile: str):
     model_provider = os.getenv("MODEL_PROVIDER").lower()
     if model_provider == "siliconflow":
-        return setup_siliconflow_model()
+        return setup_siliconflow_model(profile)
     elif model_provider == "deepseek":
-        return setup_deepseek_model()
+        return setup_deepseek_model(profile)
     elif model_provider == "tencent":
-        return setup_tencent_model()
+        return setup_tencent_model(profile)
     else:
-        raise ValueError(f"不支持的模型提供者: {model_provider}")
\ No newline at end of file
+        raise ValueError(f"不支持的模型提供者: {model_provider}")
+
+def setup_model(agent_name: Optional[str] = None, tiering: Optional[bool] = None):
+    """按智能体名称配置模型
+
+    Args:
+        agent_name: 智能体名称，用于查找模型档位；为空时使用 strong 档位
+        tiering: 是否按角色分档，为空时读取 MODEL_TIERING
+
+    Returns:
+        BaseLlm: fast 档位且 MODEL_ESCALATION=on 时返回可自动升级的模型
+    """
+    profile = get_agent_profile(agent_name, tiering)
+    model = _setup_provider_model(profile)
+    if profile == FAST and os.getenv("MODEL_ESCALATION", "off").lower() == "on":
+        strong_model = _setup_provider_model(STRONG)
+        # fast 档位沿用了 strong 档位的模型时，升级没有意义
+        if strong_model.model != model.model:
+            return EscalatingLlm(model=model.model, fast=model, strong=strong_model)
+    return model
@@ -0,0 +1,211 @@
+"""
+模型档位基准测试
+分别以单模型（不分档）和分档模型运行金融分析团队，档位作为参数显式传入，不受 .env 中 MODEL_TIERING 的影响，
+在脚本化问题集上对比端到端延迟、各模型的token用量和费用
+
+两种配置逐题交替先后顺序运行，避免后跑的一方总是用上预热过的 MCP 连接和工具缓存
+
+用法: python -m common.model_benchmark --limit 10
+"""
+
+import argparse
+import asyncio
+import contextvars
+import importlib.util
+import json
+import os
+import statistics
+import time
+from collections import defaultdict
+from typing import Callable, Dict, List, Optional
+
+import litellm
+from litellm.integrations.custom_logger import CustomLogger
+from google.adk.runners import InMemoryRunner
+from google.genai import types
+
+from common.router_eval import DEFAULT_EVAL_SET, load_eval_set
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+APP_NAME = "model_benchmark"
+TAG_KEY = "benchmark_tag"
+
+# 当前问题所属的配置（off/on），每个问题在各自的任务中运行，互不干扰
+current_tag: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar(TAG_KEY, default=None)
+
+
+def _model_key(model: str) -> str:
+    """litellm 回调中的模型名不带提供者前缀，单价表的键统一去掉 openai/ 前缀"""
+    return model.removeprefix("openai/") if model else model
+
+
+class UsageRecorder(CustomLogger):
+    """记录每次LLM调用的模型、token用量、费用和耗时
+
+    成功回调由 litellm 在后台任务中延后执行，此时可能已经开始运行另一个配置，
+    因此在发起请求时把配置标签写入该次调用的 kwargs，回调中从 kwargs 读取。
+    """
+
+    def __init__(self):
+        super().__init__()
+        self.calls: List[Dict] = []
+        self.pending = 0
+
+    def log_pre_api_call(self, model, messages, kwargs):
+        kwargs[TAG_KEY] = current_tag.get()
+        self.pending += 1
+
+    async def async_log_failure_event(self, kwargs, response_obj, start_time, end_time):
+        self.pending -= 1
+
+    async def wait_pending(self, timeout: float = 10.0):
+        """等待已发起调用的回调执行完，避免最后几次调用漏记"""
+        deadline = time.monotonic() + timeout
+        while self.pending > 0 and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+
+    async def async_log_success_event(self, kwargs, response_obj, start_time, end_time):
+        self.pending -= 1
+        usage = getattr(response_obj, "usage", None)
+        self.calls.append({
+            "tag": kwargs.get(TAG_KEY),
+            "model": _model_key(kwargs.get("model")),
+            "prompt_tokens": getattr(usage, "prompt_tokens", 0) or 0,
+            "completion_tokens": getattr(usage, "completion_tokens", 0) or 0,
+            "cost": kwargs.get("response_cost"),
+            "latency": (end_time - start_time).total_seconds(),
+        })
+
+
+def load_team_factory() -> Callable:
+    """加载 multi-agent 中带快速路由的团队工厂函数（目录名含连字符，无法直接import）"""
+    path = os.path.join(PROJECT_DIR, "multi-agent", "agent.py")
+    spec = importlib.util.spec_from_file_location("multi_agent_benchmark", path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.create_routed_analysis_team
+
+
+def _call_cost(call: Dict, prices: Dict[str, List[float]]) -> Optional[float]:
+    """优先使用 --prices 中的单价（元/百万token），否则使用 litellm 计算的费用（hunyuan、SiliconFlow 等模型没有）"""
+    price = prices.get(call["model"])
+    if price:
+        return (call["prompt_tokens"] * price[0] + call["completion_tokens"] * price[1]) / 1_000_000
+    return call["cost"]
+
+
+async def run_query(runner: InMemoryRunner, query: str, tag: str) -> float:
+    """在新会话中运行一个问题，返回端到端耗时（秒）"""
+    current_tag.set(tag)
+    session = await runner.session_service.create_session(app_name=APP_NAME, user_id="benchmark")
+    start = time.perf_counter()
+    async for _ in runner.run_async(
+        user_id="benchmark",
+        session_id=session.id,
+        new_message=types.Content(role="user", parts=[types.Part(text=query)]),
+    ):
+        pass
+    return time.perf_counter() - start
+
+
+def summarize(tiering: str, latencies: List[float], failures: int, calls: List[Dict], prices: Dict[str, List[float]]) -> Dict:
+    """汇总单个配置的延迟和各模型的token用量、费用"""
+    models = defaultdict(lambda: {"calls": 0, "prompt_tokens": 0, "completion_tokens": 0, "cost": 0.0, "cost_known": True})
+    for call in calls:
+        stats = models[call["model"]]
+        stats["calls"] += 1
+        stats["prompt_tokens"] += call["prompt_tokens"]
+        stats["completion_tokens"] += call["completion_tokens"]
+        cost = _call_cost(call, prices)
+        if cost is None:
+            stats["cost_known"] = False
+        else:
+            stats["cost"] += cost
+
+    return {
+        "tiering": tiering,
+        "queries": len(latencies) + failures,
+        "failures": failures,
+        "avg_latency": statistics.mean(latencies) if latencies else 0.0,
+        "p50_latency": statistics.median(latencies) if latencies else 0.0,
+        "max_latency": max(latencies) if latencies else 0.0,
+        "models": dict(models),
+    }
+
+
+async def run_benchmark(
+    queries: List[str],
+    factory: Callable,
+    recorder: UsageRecorder,
+    prices: Dict[str, List[float]],
+) -> List[Dict]:
+    """以单模型（off）和分档模型（on）运行问题集，档位显式传给工厂函数，不受 .env 影响"""
+    configs = ("off", "on")
+    runners = {tiering: InMemoryRunner(agent=factory(tiering=tiering == "on"), app_name=APP_NAME) for tiering in configs}
+    latencies: Dict[str, List[float]] = {tiering: [] for tiering in configs}
+    failures = {tiering: 0 for tiering in configs}
+
+    for index, query in enumerate(queries):
+        order = configs if index % 2 == 0 else configs[::-1]
+        for tiering in order:
+            try:
+                # 在独立任务中运行，标签只作用于本次问题发起的LLM调用
+                latencies[tiering].append(await asyncio.create_task(run_query(runners[tiering], query, tiering)))
+            except Exception as e:
+                failures[tiering] += 1
+                print(f"[{tiering}] 运行失败: {query}: {e}")
+
+    await recorder.wait_pending()
+    return [
+        summarize(tiering, latencies[tiering], failures[tiering],
+                  [call for call in recorder.calls if call["tag"] == tiering], prices)
+        for tiering in configs
+    ]
+
+
+def print_report(result: Dict):
+    label = "分档模型" if result["tiering"] == "on" else "单模型"
+    print(f"\n=== {label} (tiering={result['tiering']}) ===")
+    print(f"问题数: {result['queries']}，失败: {result['failures']}")
+    print(f"延迟: 平均 {result['avg_latency']:.2f}s，P50 {result['p50_latency']:.2f}s，最大 {result['max_latency']:.2f}s")
+    for model, stats in result["models"].items():
+        cost = f"{stats['cost']:.4f}" if stats["cost_known"] else "未知（请通过 --prices 提供单价）"
+        print(f"- {model}: 调用 {stats['calls']} 次，输入 {stats['prompt_tokens']} tokens，"
+              f"输出 {stats['completion_tokens']} tokens，费用 {cost}")
+
+
+async def main(args):
+    queries = [sample["query"] for sample in load_eval_set(args.eval_set)]
+    if args.limit:
+        queries = queries[:args.limit]
+    prices = {}
+    if args.prices:
+        with open(args.prices, encoding="utf-8") as f:
+            prices = {_model_key(model): price for model, price in json.load(f).items()}
+
+    recorder = UsageRecorder()
+    litellm.callbacks = [recorder]
+    factory = load_team_factory()
+
+    results = await run_benchmark(queries, factory, recorder, prices)
+    for result in results:
+        print_report(result)
+
+    baseline, tiered = results
+    if baseline["avg_latency"]:
+        change = (tiered["avg_latency"] - baseline["avg_latency"]) / baseline["avg_latency"]
+        print(f"\n平均延迟变化: {change:+.1%}")
+    if all(stats["cost_known"] for result in results for stats in result["models"].values()):
+        baseline_cost = sum(stats["cost"] for stats in baseline["models"].values())
+        tiered_cost = sum(stats["cost"] for stats in tiered["models"].values())
+        print(f"总费用: 单模型 {baseline_cost:.4f}，分档模型 {tiered_cost:.4f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--eval-set", type=str, default=DEFAULT_EVAL_SET, help="问题集路径")
+    parser.add_argument("--limit", type=int, default=0, help="只运行前N个问题，0表示全部")
+    parser.add_argument("--prices", type=str, default=None,
+                        help='模型单价JSON文件，格式 {"模型名": [输入单价, 输出单价]}，单位为每百万token，'
+                             '模型名与 *_MODEL 配置一致，可带或不带 openai/ 前缀')
+    asyncio.run(main(parser.parse_args()))
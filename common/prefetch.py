@@ -0,0 +1,331 @@
+"""
+投机式数据预取
+请求开始时在本地识别股票代码和基金代码，趁LLM还在规划时后台调用可能用到的 Tushare MCP 工具；
+之后真正的工具调用如果是同一工具、同一代码，且请求的日期区间落在预取区间内，就从已完成的预取结果中
+截取请求的日期对应的数据返回。
+"""
+
+import asyncio
+import datetime
+import json
+import logging
+import time
+from collections import defaultdict
+from dataclasses import dataclass, field
+from typing import Any, Dict, List, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from google.adk.agents.callback_context import CallbackContext
+from google.adk.tools.base_tool import BaseTool
+from google.adk.tools.tool_context import ToolContext
+from google.genai import types
+from mcp.types import CallToolResult, TextContent
+
+from common.finance_tool import finance_toolsets
+from common.router import Entities, extract_entities
+
+logger = logging.getLogger(__name__)
+
+# 识别到代码时预取的 Tushare MCP 工具；服务端未提供的工具会被跳过
+STOCK_PREFETCH_TOOLS = ["daily", "daily_basic", "fina_indicator"]
+FUND_PREFETCH_TOOLS = ["fund_nav", "fund_portfolio"]
+PREFETCHABLE_TOOLS = set(STOCK_PREFETCH_TOOLS + FUND_PREFETCH_TOOLS)
+
+# 按日期区间取数的工具预取最近 PREFETCH_DAYS 天，其余工具只带 ts_code
+DATE_RANGE_TOOLS = {"daily", "daily_basic", "fund_nav"}
+PREFETCH_DAYS = 90
+DATE_KEYS = {"start_date", "end_date", "trade_date", "nav_date"}
+# 各工具返回数据中表示日期的列，用于按请求的日期截取预取结果
+DATE_FIELDS = {"daily": "trade_date", "daily_basic": "trade_date", "fund_nav": "nav_date"}
+
+# 预取批次的最长存活时间（秒），兜底清理没有走到结束回调的请求
+MAX_BATCH_AGE = 300
+
+
+def _normalize_args(args: Dict[str, Any]) -> Dict[str, str]:
+    return {key: str(value).strip().upper() if key == "ts_code" else str(value) for key, value in args.items() if value}
+
+
+def covers(prefetched: Dict[str, str], requested: Dict[str, Any]) -> bool:
+    """判断预取的参数能否满足模型的实际调用
+
+    除日期外的参数必须完全一致；请求带日期时须落在预取区间内，不带日期时预取也不能带日期。
+    预取区间比请求的区间更宽时，还需经 narrow_result 截取后才能返回。
+
+    Args:
+        prefetched: 预取时使用的参数
+        requested: 模型实际调用的参数
+
+    Returns:
+        bool: 是否可以用预取结果代替实际调用
+    """
+    requested = _normalize_args(requested)
+    if {k: v for k, v in requested.items() if k not in DATE_KEYS} != {
+        k: v for k, v in prefetched.items() if k not in DATE_KEYS
+    }:
+        return False
+
+    dates = {k: v for k, v in requested.items() if k in DATE_KEYS}
+    if not dates:
+        return not any(k in DATE_KEYS for k in prefetched)
+    if "start_date" not in prefetched:
+        return False
+
+    start, end = prefetched["start_date"], prefetched["end_date"]
+    single = dates.get("trade_date") or dates.get("nav_date")
+    if single:
+        return len(dates) == 1 and start <= single <= end
+    return "start_date" in dates and start <= dates["start_date"] and dates.get("end_date", end) <= end
+
+
+def _parse_rows(text: str) -> Optional[Tuple[List[Dict[str, Any]], Optional[List[str]]]]:
+    """解析 JSON 格式的表格数据，支持记录列表和 Tushare 的 fields/items 格式
+
+    Returns:
+        tuple: (数据行, fields/items 格式的列名)，无法解析时返回 None
+    """
+    try:
+        data = json.loads(text)
+    except ValueError:
+        return None
+    if isinstance(data, dict) and isinstance(data.get("data"), (list, dict)):
+        data = data["data"]
+    if isinstance(data, list) and all(isinstance(row, dict) for row in data):
+        return data, None
+    if isinstance(data, dict) and isinstance(data.get("fields"), list) and isinstance(data.get("items"), list):
+        fields = data["fields"]
+        return [dict(zip(fields, item)) for item in data["items"]], fields
+    return None
+
+
+def narrow_result(tool_name: str, prefetched: Dict[str, str], requested: Dict[str, Any], result: Any) -> Optional[Any]:
+    """把预取结果截取为模型实际请求的日期对应的数据
+
+    请求的参数与预取参数一致时原样返回；否则按 DATE_FIELDS 中的日期列过滤数据行，
+    保持原有的行顺序和数据格式。无法解析或截取后没有数据时返回 None，由真正的工具调用重新获取。
+
+    Args:
+        tool_name: 工具名
+        prefetched: 预取时使用的参数
+        requested: 模型实际调用的参数（已确认被预取覆盖）
+        result: 预取得到的 MCP 工具结果
+
+    Returns:
+        截取后的工具结果，或 None
+    """
+    requested = _normalize_args(requested)
+    if requested == prefetched:
+        return result
+
+    date_field = DATE_FIELDS.get(tool_name)
+    contents = getattr(result, "content", None) or []
+    if date_field is None or not isinstance(result, CallToolResult) or len(contents) != 1 \
+            or not isinstance(contents[0], TextContent):
+        return None
+    parsed = _parse_rows(contents[0].text)
+    if parsed is None:
+        return None
+    rows, fields = parsed
+
+    single = requested.get("trade_date") or requested.get("nav_date")
+    if single:
+        start = end = single
+    else:
+        start, end = requested["start_date"], requested.get("end_date", prefetched["end_date"])
+    if any(date_field not in row for row in rows):
+        return None
+    selected = [row for row in rows if start <= str(row[date_field]) <= end]
+    if not selected:
+        return None
+
+    if fields is None:
+        text = json.dumps(selected, ensure_ascii=False)
+    else:
+        text = json.dumps({"fields": fields, "items": [[row[f] for f in fields] for row in selected]}, ensure_ascii=False)
+    return result.model_copy(update={
+        "content": [TextContent(type="text", text=text)],
+        "structuredContent": None,
+    })
+
+
+@dataclass
+class _Prefetch:
+    """单个预取调用"""
+    tool_name: str
+    args: Dict[str, str]
+    task: asyncio.Task
+    used: bool = False
+
+
+@dataclass
+class _PrefetchBatch:
+    """单次请求发起的预取任务"""
+    started_at: float
+    planner: Optional[asyncio.Task] = None
+    prefetches: List[_Prefetch] = field(default_factory=list)
+
+
+class SpeculativePrefetcher:
+    """通过智能体回调接入的预取器
+
+    - before_agent_callback: 挂在入口智能体上，请求开始时启动预取
+    - before_tool_callback: 挂在使用工具的智能体上，命中时直接返回预取结果
+    - close: 由入口智能体在 finally 中调用，请求结束（包括中途断开）时取消未完成的预取并汇总命中情况
+    """
+
+    def __init__(self):
+        self._batches: Dict[str, _PrefetchBatch] = {}
+        self._mcp_tools: Optional[Dict[str, BaseTool]] = None
+        # prefetched/hits: 发起的预取及其中被用上的个数；calls/covered_calls: 模型实际调用及其中由预取满足的次数
+        self.stats: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"prefetched": 0, "hits": 0, "calls": 0, "covered_calls": 0}
+        )
+
+    async def _get_mcp_tools(self) -> Dict[str, BaseTool]:
+        """列出 Tushare MCP 工具，成功后缓存"""
+        if self._mcp_tools is None:
+            tools: Dict[str, BaseTool] = {}
+            try:
+                for toolset in finance_toolsets:
+                    for tool in await toolset.get_tools():
+                        tools[tool.name] = tool
+            except Exception as e:
+                logger.warning(f"获取MCP工具列表失败，本次跳过数据预取: {e}")
+                return {}
+            self._mcp_tools = tools
+        return self._mcp_tools
+
+    def plan(self, entities: Entities, available: Set[str]) -> List[Tuple[str, Dict[str, str]]]:
+        """根据识别出的证券代码推测可能的工具调用
+
+        Args:
+            entities: 从问题中识别出的证券实体
+            available: 当前可用的 MCP 工具名
+
+        Returns:
+            list: (工具名, 参数) 列表
+        """
+        today = datetime.datetime.now(ZoneInfo("Asia/Shanghai")).date()
+        date_range = {
+            "start_date": (today - datetime.timedelta(days=PREFETCH_DAYS)).strftime("%Y%m%d"),
+            "end_date": today.strftime("%Y%m%d"),
+        }
+        calls = []
+        for codes, tool_names in ((entities.stock_codes, STOCK_PREFETCH_TOOLS), (entities.fund_codes, FUND_PREFETCH_TOOLS)):
+            for code in codes:
+                for name in tool_names:
+                    if name in available:
+                        args = {"ts_code": code, **(date_range if name in DATE_RANGE_TOOLS else {})}
+                        calls.append((name, args))
+        return calls
+
+    async def _fetch(self, tool: BaseTool, args: Dict[str, str], tool_context: ToolContext) -> Any:
+        """执行单个预取，失败时返回 None，由真正的工具调用重新获取"""
+        try:
+            result = await tool.run_async(args=args, tool_context=tool_context)
+        except Exception as e:
+            logger.warning(f"数据预取失败: {tool.name} {args}: {e}")
+            return None
+        return None if getattr(result, "isError", False) else result
+
+    def _expire_batches(self):
+        now = time.monotonic()
+        for invocation_id, batch in list(self._batches.items()):
+            if now - batch.started_at > MAX_BATCH_AGE:
+                self.close(invocation_id)
+
+    async def _start_fetches(self, batch: _PrefetchBatch, entities: Entities, tool_context: ToolContext):
+        """列出可用工具并发起预取，在后台任务中运行，失败不会影响请求本身"""
+        mcp_tools = await self._get_mcp_tools()
+        calls = self.plan(entities, set(mcp_tools))
+        for name, args in calls:
+            task = asyncio.create_task(self._fetch(mcp_tools[name], args, tool_context))
+            batch.prefetches.append(_Prefetch(name, args, task))
+            self.stats[name]["prefetched"] += 1
+        logger.info(f"已启动{len(calls)}个数据预取任务: {', '.join(name for name, _ in calls)}")
+
+    async def before_agent_callback(self, callback_context: CallbackContext) -> Optional[types.Content]:
+        """请求开始时按用户问题启动后台预取"""
+        self._expire_batches()
+        invocation_id = callback_context.invocation_id
+        user_content = callback_context.user_content
+        if invocation_id in self._batches or not user_content or not user_content.parts:
+            return None
+
+        entities = extract_entities("".join(part.text or "" for part in user_content.parts))
+        if not entities.stock_codes and not entities.fund_codes:
+            return None
+
+        batch = _PrefetchBatch(started_at=time.monotonic())
+        self._batches[invocation_id] = batch
+        tool_context = ToolContext(callback_context._invocation_context)
+        batch.planner = asyncio.create_task(self._start_fetches(batch, entities, tool_context))
+        return None
+
+    async def before_tool_callback(
+        self, tool: BaseTool, args: Dict[str, Any], tool_context: ToolContext
+    ) -> Optional[Any]:
+        """工具调用前查找能覆盖本次调用的预取结果，命中则跳过实际调用"""
+        batch = self._batches.get(tool_context.invocation_id)
+        if batch is None or tool.name not in PREFETCHABLE_TOOLS:
+            return None
+
+        if batch.planner:
+            await asyncio.wait({batch.planner})
+        self.stats[tool.name]["calls"] += 1
+        for prefetch in batch.prefetches:
+            if prefetch.tool_name != tool.name or not covers(prefetch.args, args):
+                continue
+            await asyncio.wait({prefetch.task})
+            if prefetch.task.cancelled() or not prefetch.task.result():
+                break
+            # 只有能截取出与请求一致的数据时才算命中
+            result = narrow_result(tool.name, prefetch.args, args, prefetch.task.result())
+            if result is None:
+                break
+            self.stats[tool.name]["covered_calls"] += 1
+            if not prefetch.used:
+                self.stats[tool.name]["hits"] += 1
+                prefetch.used = True
+            logger.info(f"预取命中: {tool.name} {args}")
+            return result
+
+        logger.debug(f"预取未命中: {tool.name} {args}")
+        return None
+
+    def close(self, invocation_id: str):
+        """结束一次请求的预取：取消未完成的任务并记录命中情况"""
+        batch = self._batches.pop(invocation_id, None)
+        if batch is None:
+            return
+        if batch.planner:
+            batch.planner.cancel()
+        for prefetch in batch.prefetches:
+            prefetch.task.cancel()
+        used = sum(prefetch.used for prefetch in batch.prefetches)
+        logger.info(f"数据预取: 发起{len(batch.prefetches)}个，命中{used}个")
+
+    def cancel_all(self):
+        """取消所有进行中的预取，服务关闭时调用"""
+        for invocation_id in list(self._batches):
+            self.close(invocation_id)
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        """按工具汇总累计的预取效果，用于调整预取策略
+
+        Returns:
+            dict: 工具名 -> 计数，以及 hit_rate（预取被用上的比例）和
+                call_coverage（模型实际调用中由预取满足的比例）
+        """
+        return {
+            name: {
+                **counts,
+                "hit_rate": counts["hits"] / counts["prefetched"] if counts["prefetched"] else 0.0,
+                "call_coverage": counts["covered_calls"] / counts["calls"] if counts["calls"] else 0.0,
+            }
+            for name, counts in self.stats.items()
+        }
+
+
+# 全局预取器，各智能体共享同一份缓存和统计
+prefetcher = SpeculativePrefetcher()
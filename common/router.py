@@ -0,0 +1,189 @@
+"""
+本地快速路由
+在团队负责人LLM之前，通过关键词、股票代码、基金代码识别高置信度的委托目标，
+命中时直接交给对应专家，省掉负责人一次完整的LLM往返；不确定时返回空目标，交回负责人处理。
+"""
+
+import re
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional
+
+# 专家名称，需与 multi-agent 中的智能体 name 保持一致
+STOCK_ANALYST = "股票分析专家"
+FUND_ANALYST = "基金分析专家"
+RISK_ANALYST = "风险评估专家"
+MARKET_ANALYST = "市场分析专家"
+
+SPECIALISTS = [STOCK_ANALYST, FUND_ANALYST, RISK_ANALYST, MARKET_ANALYST]
+
+# 关键词权重：权重 >= 2 的词单独出现即可构成高置信度信号
+ROUTE_KEYWORDS: Dict[str, Dict[str, float]] = {
+    STOCK_ANALYST: {
+        "股票": 2, "个股": 2, "股价": 2, "K线": 2, "k线": 2, "均线": 2, "MACD": 2,
+        "RSI": 2, "KDJ": 2, "市盈率": 2, "市净率": 2, "PEG": 2, "目标价": 2,
+        "涨停": 2, "跌停": 2, "财报": 1.5, "估值": 1, "买入": 1, "卖出": 1, "持有": 1,
+    },
+    FUND_ANALYST: {
+        "基金": 2, "ETF": 2, "etf": 2, "LOF": 2, "净值": 2, "基金经理": 2, "定投": 2,
+        "股票型基金": 2, "股票基金": 2, "债券基金": 2, "混合型基金": 2, "指数基金": 2,
+        "夏普比率": 2, "申购": 2, "赎回": 2, "持仓结构": 1, "最大回撤": 1,
+    },
+    RISK_ANALYST: {
+        "止损": 2, "仓位": 2, "资产配置": 2, "分散投资": 2, "VaR": 2, "风险控制": 2,
+        "风控": 2, "风险偏好": 2, "波动率": 1.5, "风险": 1, "回撤": 1,
+    },
+    MARKET_ANALYST: {
+        "大盘": 2, "宏观": 2, "货币政策": 2, "财政政策": 2, "降息": 2, "降准": 2,
+        "CPI": 2, "GDP": 2, "市场情绪": 2, "资金流向": 2, "北向资金": 2, "热点板块": 2,
+        "上证指数": 2, "沪深300": 1.5, "板块": 1.5, "行业": 1.5, "政策": 1,
+    },
+}
+
+# 常见公司简称 -> Tushare ts_code
+COMPANY_CODES: Dict[str, str] = {
+    "贵州茅台": "600519.SH", "茅台": "600519.SH", "五粮液": "000858.SZ",
+    "宁德时代": "300750.SZ", "比亚迪": "002594.SZ", "招商银行": "600036.SH",
+    "中国平安": "601318.SH", "工商银行": "601398.SH", "隆基绿能": "601012.SH",
+    "美的集团": "000333.SZ", "格力电器": "000651.SZ", "中芯国际": "688981.SH",
+    "东方财富": "300059.SZ", "恒瑞医药": "600276.SH", "海康威视": "002415.SZ",
+}
+
+# 识别到证券代码或公司简称时的加分
+ENTITY_SCORE = 3.0
+# 低于该分数视为噪声，不算作弱信号（主要过滤分类器的小概率输出）
+NOISE_SCORE = 0.5
+
+# 6位证券代码，可带交易所后缀；带货币符号或后跟金额、数量单位的数字（如“500000元”）不算代码。
+# “股”“点”只有作单位时才排除，“600519股价”“600519股票”“600519点评”中的仍是代码
+_CODE_PATTERN = re.compile(
+    r"(?<![0-9.¥￥$])(\d{6})(?:\.(SH|SZ|BJ|OF))?(?![0-9])(?!\.[0-9])"
+    r"(?!\s*(?:元|块|万|亿|份|手|%|％|股(?![票价东息份吧评])|点(?!评)))",
+    re.IGNORECASE,
+)
+_STOCK_PREFIXES = ("600", "601", "603", "605", "688", "689", "000", "001", "002", "003", "300", "301")
+_BJ_PREFIXES = ("43", "83", "87", "92")
+_EXCHANGE_FUND_PREFIXES = ("15", "16", "18", "50", "51", "52", "56", "58")
+
+
+@dataclass
+class Entities:
+    """从用户问题中识别出的证券实体"""
+    stock_codes: List[str] = field(default_factory=list)
+    fund_codes: List[str] = field(default_factory=list)
+    companies: List[str] = field(default_factory=list)
+
+
+@dataclass
+class RouteDecision:
+    """路由结果，targets 为空表示交回团队负责人"""
+    targets: List[str]
+    scores: Dict[str, float]
+    reason: str
+
+    @property
+    def fast_path(self) -> bool:
+        return bool(self.targets)
+
+
+def _append_unique(items: List[str], value: str):
+    if value not in items:
+        items.append(value)
+
+
+def extract_entities(text: str) -> Entities:
+    """识别问题中的股票代码、基金代码和公司简称
+
+    Args:
+        text: 用户问题
+
+    Returns:
+        Entities: 识别到的实体，代码均为 Tushare ts_code 格式
+    """
+    entities = Entities()
+    mentions_fund = "基金" in text
+
+    for match in _CODE_PATTERN.finditer(text):
+        code, suffix = match.group(1), (match.group(2) or "").upper()
+        if suffix == "OF" or code.startswith(_EXCHANGE_FUND_PREFIXES):
+            exchange = suffix or ("SZ" if code.startswith(("15", "16", "18")) else "SH")
+            _append_unique(entities.fund_codes, f"{code}.{exchange}")
+        elif code.startswith(_STOCK_PREFIXES):
+            # 000xxx-003xxx 同时是场外基金代码段，有“基金”字样时按基金处理
+            if mentions_fund and code.startswith("00") and not suffix:
+                _append_unique(entities.fund_codes, f"{code}.OF")
+            else:
+                exchange = suffix or ("SH" if code.startswith("6") else "SZ")
+                _append_unique(entities.stock_codes, f"{code}.{exchange}")
+        elif code.startswith(_BJ_PREFIXES):
+            _append_unique(entities.stock_codes, f"{code}.BJ")
+
+    for name, ts_code in COMPANY_CODES.items():
+        if name in text and ts_code not in entities.stock_codes:
+            _append_unique(entities.companies, name)
+            _append_unique(entities.stock_codes, ts_code)
+
+    return entities
+
+
+def score_query(text: str) -> Dict[str, float]:
+    """按关键词和证券实体为每位专家打分"""
+    scores = {name: 0.0 for name in SPECIALISTS}
+    # 所有专家的关键词按长度从长到短匹配，命中后从文本中抹去，
+    # 避免“股票型基金”再计入股票分析专家的“股票”、“基金经理”再计入“基金”
+    keywords = sorted(
+        ((kw, name, weight) for name, words in ROUTE_KEYWORDS.items() for kw, weight in words.items()),
+        key=lambda item: len(item[0]),
+        reverse=True,
+    )
+    remaining = text
+    for kw, name, weight in keywords:
+        if kw in remaining:
+            scores[name] += weight
+            remaining = remaining.replace(kw, "\0" * len(kw))
+
+    entities = extract_entities(text)
+    if entities.stock_codes:
+        scores[STOCK_ANALYST] += ENTITY_SCORE
+    if entities.fund_codes:
+        scores[FUND_ANALYST] += ENTITY_SCORE
+    return scores
+
+
+def route_query(
+    text: str,
+    threshold: float = 2.0,
+    max_targets: int = 2,
+    classifier: Optional[Callable[[str], Dict[str, float]]] = None,
+    classifier_weight: float = 2.0,
+) -> RouteDecision:
+    """判断问题能否跳过团队负责人直接交给专家
+
+    只有当命中的专家得分都达到阈值、且没有其他专家出现弱信号时才走快速路径，
+    任何模棱两可的情况都交回团队负责人。
+
+    Args:
+        text: 用户问题
+        threshold: 构成高置信度所需的最低得分
+        max_targets: 快速路径最多直接委托的专家数，超过时交给负责人统筹
+        classifier: 可选的本地分类器，返回各专家的概率
+        classifier_weight: 分类器概率计入得分时的权重
+
+    Returns:
+        RouteDecision: 路由结果
+    """
+    scores = score_query(text)
+    if classifier is not None:
+        for name, prob in classifier(text).items():
+            if name in scores:
+                scores[name] += classifier_weight * prob
+
+    strong = [name for name in SPECIALISTS if scores[name] >= threshold]
+    weak = [name for name in SPECIALISTS if NOISE_SCORE <= scores[name] < threshold]
+
+    if not strong:
+        return RouteDecision([], scores, "没有高置信度的专家")
+    if weak:
+        return RouteDecision([], scores, f"存在弱信号: {', '.join(weak)}")
+    if len(strong) > max_targets:
+        return RouteDecision([], scores, f"涉及{len(strong)}位专家，需要负责人统筹")
+    return RouteDecision(strong, scores, "高置信度命中")
@@ -0,0 +1,117 @@
+"""
+本地快速路由离线评估
+读取带标注的问题集，统计路由准确率、快速路径覆盖率、证券代码识别准确率以及每题节省的延迟
+节省的延迟按 --leader-ms 给定的负责人单轮耗时估算，只计入走对的快速路径；走错的快速路径单独统计
+
+用法: python -m common.router_eval --leader-ms 3000（不需要配置 MCP/Tavily 密钥）
+"""
+
+import argparse
+import json
+import os
+import time
+from typing import Dict, List
+
+from common.router import extract_entities, route_query
+
+DEFAULT_EVAL_SET = os.path.join(os.path.dirname(os.path.abspath(__file__)), "router_eval.jsonl")
+
+
+def load_eval_set(path: str) -> List[Dict]:
+    """加载标注集
+
+    targets 为空表示应交给团队负责人；可选的 stock_codes / fund_codes 标注应识别出的证券代码，
+    用于检查数据预取能否拿到代码，不依赖关键词是否把路由“救”回来。
+    """
+    with open(path, encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(samples: List[Dict], leader_ms: float) -> Dict:
+    """逐条路由并汇总指标
+
+    Args:
+        samples: 标注样本
+        leader_ms: 团队负责人一次LLM往返的耗时（毫秒），快速路径走对即省下这部分
+
+    Returns:
+        dict: 评估指标和误判样本
+    """
+    correct = fast_path = fast_path_correct = fast_path_wrong = 0
+    route_ms = 0.0
+    saved_ms = 0.0
+    mistakes = []
+    entity_checked = entity_correct = 0
+    entity_mistakes = []
+
+    for sample in samples:
+        start = time.perf_counter()
+        decision = route_query(sample["query"])
+        elapsed = (time.perf_counter() - start) * 1000
+        route_ms += elapsed
+
+        expected = sorted(sample["targets"])
+        is_correct = sorted(decision.targets) == expected
+        correct += is_correct
+        # 路由本身的耗时总是额外开销；只有走对的快速路径才省下负责人那一轮
+        saved_ms -= elapsed
+        if decision.fast_path:
+            fast_path += 1
+            if is_correct:
+                fast_path_correct += 1
+                saved_ms += leader_ms
+            else:
+                fast_path_wrong += 1
+        if not is_correct:
+            mistakes.append({
+                "query": sample["query"],
+                "expected": sample["targets"],
+                "actual": decision.targets,
+                "reason": decision.reason,
+            })
+
+        labels = {key: sample[key] for key in ("stock_codes", "fund_codes") if key in sample}
+        if labels:
+            entities = extract_entities(sample["query"])
+            actual = {key: getattr(entities, key) for key in labels}
+            entity_checked += 1
+            if all(sorted(actual[key]) == sorted(codes) for key, codes in labels.items()):
+                entity_correct += 1
+            else:
+                entity_mistakes.append({"query": sample["query"], "expected": labels, "actual": actual})
+
+    total = len(samples)
+    return {
+        "total": total,
+        "accuracy": correct / total if total else 0.0,
+        "fast_path_rate": fast_path / total if total else 0.0,
+        "fast_path_precision": fast_path_correct / fast_path if fast_path else 0.0,
+        "fast_path_wrong": fast_path_wrong,
+        "avg_route_ms": route_ms / total if total else 0.0,
+        "avg_saved_ms": saved_ms / total if total else 0.0,
+        "mistakes": mistakes,
+        "entity_checked": entity_checked,
+        "entity_accuracy": entity_correct / entity_checked if entity_checked else 0.0,
+        "entity_mistakes": entity_mistakes,
+    }
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--eval-set", type=str, default=DEFAULT_EVAL_SET, help="标注集路径")
+    parser.add_argument("--leader-ms", type=float, default=3000, help="团队负责人一次LLM往返的耗时（毫秒）")
+    args = parser.parse_args()
+
+    report = evaluate(load_eval_set(args.eval_set), args.leader_ms)
+    print(f"样本数: {report['total']}")
+    print(f"路由准确率: {report['accuracy']:.1%}")
+    print(f"快速路径覆盖率: {report['fast_path_rate']:.1%}")
+    print(f"快速路径准确率: {report['fast_path_precision']:.1%}")
+    print(f"走错的快速路径: {report['fast_path_wrong']} 题（不计入节省）")
+    print(f"证券代码识别准确率: {report['entity_accuracy']:.1%}（{report['entity_checked']} 题有标注）")
+    print(f"平均路由耗时: {report['avg_route_ms']:.3f} ms")
+    print(f"每题平均节省延迟: {report['avg_saved_ms']:.0f} ms（按负责人单轮 {args.leader_ms:.0f} ms 估算）")
+    for mistake in report["mistakes"]:
+        print(f"- {mistake['query']} 期望: {mistake['expected']} 实际: {mistake['actual']} ({mistake['reason']})")
+    for mistake in report["entity_mistakes"]:
+        print(f"- {mistake['query']} 期望代码: {mistake['expected']} 实际: {mistake['actual']}")
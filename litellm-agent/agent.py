@@ -3,8 +3,12 @@ SiliconFlow金融分析智能体
 基于Google ADK和LiteLLM的金融数据分析专家
 """
 
-from google.adk.agents import LlmAgent
+from google.adk.agents import BaseAgent, LlmAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
 from google.adk.models.lite_llm import LiteLlm
+from typing import AsyncGenerator
+from typing_extensions import override
 
 from dotenv import load_dotenv
 import os
@@ -14,6 +18,7 @@ from common.finance_tool import finance_toolsets
 from common.time_tool import get_current_time
 from common.search_tool import search_web
 from common.agent_setup import setup_model
+from common.prefetch import prefetcher
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -53,13 +58,14 @@ def create_finance_agent() -> LlmAgent:
     """创建金融分析智能体"""
     try:
         
-        model = setup_model()
+        model = setup_model("金融分析专家")
         agent = LlmAgent(
             model=model,
             name="金融分析专家",
             instruction=create_agent_instruction(),
             description="专业的金融和投资分析专家，擅长股票、基金、债券等金融产品分析",
             tools=list(finance_toolsets) + [search_web],
+            before_tool_callback=prefetcher.before_tool_callback,
             #tools=[search_web],
             # 可以根据需要启用规划器
             # planner=PlanReActPlanner(),
@@ -71,5 +77,29 @@ def create_finance_agent() -> LlmAgent:
         logger.error(f"智能体创建失败: {e}")
         raise
 
+class PrefetchScope(BaseAgent):
+    """包裹金融分析智能体，请求结束时（包括客户端断开）取消本次请求的数据预取"""
+
+    @override
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        try:
+            async for event in self.sub_agents[0].run_async(ctx):
+                yield event
+        finally:
+            prefetcher.close(ctx.invocation_id)
+
+
+def create_root_agent() -> PrefetchScope:
+    """创建入口智能体：在请求开始时启动数据预取，再交给金融分析智能体"""
+    agent = create_finance_agent()
+    # 回复后不需要转回入口
+    agent.disallow_transfer_to_parent = True
+    return PrefetchScope(
+        name="金融分析入口",
+        description="启动并管理数据预取的入口，实际分析由金融分析专家完成",
+        sub_agents=[agent],
+        before_agent_callback=prefetcher.before_agent_callback,
+    )
+
 # 主智能体实例
-root_agent = create_finance_agent()
+root_agent = create_root_agent()
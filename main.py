@@ -1,5 +1,6 @@
 import os
 import sys
+from contextlib import asynccontextmanager
 
 import uvicorn
 from google.adk.cli.fast_api import get_fast_api_app
@@ -13,6 +14,17 @@ ALLOWED_ORIGINS = ["http://localhost", "http://localhost:8080", "*"]
 # Set web=True if you intend to serve a web interface, False otherwise
 SERVE_WEB_INTERFACE = True
 
+
+@asynccontextmanager
+async def lifespan(app):
+    try:
+        yield
+    finally:
+        # 服务关闭时取消所有进行中的数据预取
+        from common.prefetch import prefetcher
+        prefetcher.cancel_all()
+
+
 # Call the function to get the FastAPI app instance
 # Ensure the agent directory name ('capital_agent') matches your agent folder
 app = get_fast_api_app(
@@ -20,6 +32,7 @@ app = get_fast_api_app(
     session_service_uri=SESSION_DB_URL,
     allow_origins=ALLOWED_ORIGINS,
     web=SERVE_WEB_INTERFACE,
+    lifespan=lifespan,
 )
 
 # You can add more FastAPI routes or configurations below if needed
@@ -28,6 +41,13 @@ app = get_fast_api_app(
 async def read_root():
     return {"Hello": "World"}
 
+
+@app.get("/prefetch/stats")
+async def prefetch_stats():
+    """数据预取的累计命中率，用于调整预取策略"""
+    from common.prefetch import prefetcher
+    return prefetcher.report()
+
 if __name__ == "__main__":
     import argparse
     
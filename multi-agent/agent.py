@@ -3,7 +3,9 @@
 基于Google ADK多智能体最佳实践
 """
 
-from google.adk.agents import LlmAgent, SequentialAgent, ParallelAgent
+from google.adk.agents import BaseAgent, LlmAgent, SequentialAgent, ParallelAgent
+from google.adk.agents.invocation_context import InvocationContext
+from google.adk.events import Event
 from google.adk.models.lite_llm import LiteLlm
 from google.adk.sessions import InMemorySessionService
 from google.adk.runners import Runner
@@ -12,12 +14,15 @@ from google.genai import types
 from dotenv import load_dotenv
 import os
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, AsyncGenerator, Callable, Optional
+from typing_extensions import override
 
 from common.finance_tool import finance_toolsets
 from common.time_tool import get_current_time
 from common.search_tool import search_web
 from common.agent_setup import setup_model
+from common.router import route_query
+from common.prefetch import prefetcher
 
 # 配置日志
 logging.basicConfig(level=logging.INFO)
@@ -25,10 +30,10 @@ logger = logging.getLogger(__name__)
 
 # ============= 专业智能体定义 =============
 
-def create_stock_analyst() -> LlmAgent:
+def create_stock_analyst(tiering: Optional[bool] = None) -> LlmAgent:
     """创建股票分析专家"""
     return LlmAgent(
-        model=setup_model(),
+        model=setup_model("股票分析专家", tiering),
         name="股票分析专家",
         description="专门分析个股技术面、基本面和估值，提供买卖建议",
         instruction=f"""
@@ -46,14 +51,15 @@ def create_stock_analyst() -> LlmAgent:
 - 给出明确的投资建议和目标价
 - 提示风险因素
 """,
-        tools=[finance_toolsets[0], search_web]  # 股票数据工具
+        tools=[finance_toolsets[0], search_web],  # 股票数据工具
+        before_tool_callback=prefetcher.before_tool_callback,
     )
 
 
-def create_fund_analyst() -> LlmAgent:
+def create_fund_analyst(tiering: Optional[bool] = None) -> LlmAgent:
     """创建基金分析专家"""
     return LlmAgent(
-        model=setup_model(),
+        model=setup_model("基金分析专家", tiering),
         name="基金分析专家", 
         description="专门分析基金业绩、投资组合和基金经理，提供基金投资建议",
         instruction=f"""
@@ -71,14 +77,15 @@ def create_fund_analyst() -> LlmAgent:
 - 给出明确的配置建议
 - 考虑投资者风险偏好
 """,
-        tools=[finance_toolsets[2], search_web]  # 基金数据工具
+        tools=[finance_toolsets[2], search_web],  # 基金数据工具
+        before_tool_callback=prefetcher.before_tool_callback,
     )
 
 
-def create_risk_analyst() -> LlmAgent:
+def create_risk_analyst(tiering: Optional[bool] = None) -> LlmAgent:
     """创建风险评估专家"""
     return LlmAgent(
-        model=setup_model(),
+        model=setup_model("风险评估专家", tiering),
         name="风险评估专家",
         description="专门进行投资风险评估、风险控制和资产配置建议",
         instruction=f"""
@@ -96,14 +103,15 @@ def create_risk_analyst() -> LlmAgent:
 - 根据市场环境调整策略
 - 强调风险提示和预警
 """,
-        tools=[finance_toolsets[1], search_web]  # 财务数据工具（用于风险计算）
+        tools=[finance_toolsets[1], search_web],  # 财务数据工具（用于风险计算）
+        before_tool_callback=prefetcher.before_tool_callback,
     )
 
 
-def create_market_analyst() -> LlmAgent:
+def create_market_analyst(tiering: Optional[bool] = None) -> LlmAgent:
     """创建市场分析专家"""
     return LlmAgent(
-        model=setup_model(),
+        model=setup_model("市场分析专家", tiering),
         name="市场分析专家",
         description="专门分析宏观经济、行业趋势和市场情绪",
         instruction=f"""
@@ -121,24 +129,25 @@ def create_market_analyst() -> LlmAgent:
 - 识别投资机会和风险
 - 提供市场择时建议
 """,
-        tools=list(finance_toolsets) + [search_web]  # 可以使用所有数据工具
+        tools=list(finance_toolsets) + [search_web],  # 可以使用所有数据工具
+        before_tool_callback=prefetcher.before_tool_callback,
     )
 
 
 # ============= 多智能体系统构建 =============
 
-def create_financial_analysis_team() -> LlmAgent:
+def create_financial_analysis_team(tiering: Optional[bool] = None) -> LlmAgent:
     """创建金融分析团队 - 层次结构模式"""
     load_dotenv(override=True)
     # 创建专业分析师
-    stock_analyst = create_stock_analyst()
-    fund_analyst = create_fund_analyst() 
-    risk_analyst = create_risk_analyst()
-    market_analyst = create_market_analyst()
+    stock_analyst = create_stock_analyst(tiering)
+    fund_analyst = create_fund_analyst(tiering) 
+    risk_analyst = create_risk_analyst(tiering)
+    market_analyst = create_market_analyst(tiering)
     
     # 创建团队负责人
     team_leader = LlmAgent(
-        model=setup_model(),
+        model=setup_model("金融分析团队负责人", tiering),
         name="金融分析团队负责人",
         description="协调金融分析团队，综合各专家意见提供投资决策",
         instruction=f"""
@@ -170,18 +179,73 @@ def create_financial_analysis_team() -> LlmAgent:
 - 给出具体的操作建议
 """,
         sub_agents=[stock_analyst, fund_analyst, risk_analyst, market_analyst],
-        tools=[search_web]  # 团队负责人可以使用所有工具
+        tools=[search_web],  # 团队负责人可以使用所有工具
+        before_tool_callback=prefetcher.before_tool_callback,
     )
     
     return team_leader
 
 
-def create_workflow_analysis_system() -> SequentialAgent:
+class FastPathRouter(BaseAgent):
+    """本地快速路由 - 高置信度问题直接交给专家，其余交给团队负责人"""
+
+    classifier: Optional[Callable[[str], Dict[str, float]]] = None
+    """可选的本地分类器，返回各专家的概率"""
+
+    @property
+    def leader(self) -> LlmAgent:
+        return self.sub_agents[0]
+
+    @override
+    async def _run_async_impl(self, ctx: InvocationContext) -> AsyncGenerator[Event, None]:
+        parts = ctx.user_content.parts if ctx.user_content and ctx.user_content.parts else []
+        user_text = "".join(part.text or "" for part in parts)
+        decision = route_query(user_text, classifier=self.classifier)
+
+        try:
+            if not decision.fast_path:
+                logger.info(f"快速路由未命中（{decision.reason}），交给{self.leader.name}")
+                async for event in self.leader.run_async(ctx):
+                    yield event
+                return
+
+            logger.info(f"快速路由命中，直接委托给: {', '.join(decision.targets)}")
+            for name in decision.targets:
+                async for event in self.leader.find_sub_agent(name).run_async(ctx):
+                    yield event
+        finally:
+            # 正常结束、出错或客户端断开都会走到这里，及时取消本次请求的数据预取
+            prefetcher.close(ctx.invocation_id)
+
+
+def create_routed_analysis_team(
+    classifier: Optional[Callable[[str], Dict[str, float]]] = None,
+    tiering: Optional[bool] = None,
+) -> FastPathRouter:
+    """创建带本地快速路由的金融分析团队
+
+    Args:
+        classifier: 可选的本地分类器，返回各专家的概率
+        tiering: 是否按角色分档使用模型，为空时读取 MODEL_TIERING
+    """
+    team_leader = create_financial_analysis_team(tiering)
+    # 每轮对话都回到路由入口，而不是停留在上一轮回复的专家
+    team_leader.disallow_transfer_to_parent = True
+    return FastPathRouter(
+        name="金融分析快速路由",
+        description="在团队负责人之前进行本地路由，明确的问题直接交给对应专家",
+        sub_agents=[team_leader],
+        classifier=classifier,
+        before_agent_callback=prefetcher.before_agent_callback,
+    )
+
+
+def create_workflow_analysis_system(tiering: Optional[bool] = None) -> SequentialAgent:
     """创建工作流分析系统 - 顺序执行模式"""
     load_dotenv(override=True)
     # 市场环境分析
     market_scanner = LlmAgent(
-        model=setup_model(),
+        model=setup_model("市场环境扫描", tiering),
         name="市场环境扫描",
         description="扫描当前市场环境和宏观因素",
         instruction="分析当前市场环境、宏观经济状况和政策环境，为后续分析提供背景",
@@ -190,7 +254,7 @@ def create_workflow_analysis_system() -> SequentialAgent:
     
     # 投资机会识别
     opportunity_finder = LlmAgent(
-        model=setup_model(),
+        model=setup_model("投资机会识别", tiering),
         name="投资机会识别",
         description="基于市场环境识别投资机会",
         instruction="基于市场环境分析结果，识别当前的投资机会和热点板块",
@@ -199,7 +263,7 @@ def create_workflow_analysis_system() -> SequentialAgent:
     
     # 风险评估
     risk_evaluator = LlmAgent(
-        model=setup_model(),
+        model=setup_model("风险评估", tiering),
         name="风险评估",
         description="评估投资机会的风险水平",
         instruction="对识别出的投资机会进行风险评估，提供风险控制建议",
@@ -208,7 +272,7 @@ def create_workflow_analysis_system() -> SequentialAgent:
     
     # 投资建议整合
     recommendation_integrator = LlmAgent(
-        model=setup_model(),
+        model=setup_model("投资建议整合", tiering),
         name="投资建议整合",
         description="整合分析结果，提供最终投资建议",
         instruction="整合前面的分析结果，提供综合的投资建议和操作策略",
@@ -221,17 +285,17 @@ def create_workflow_analysis_system() -> SequentialAgent:
     )
 
 
-def create_parallel_analysis_system() -> ParallelAgent:
+def create_parallel_analysis_system(tiering: Optional[bool] = None) -> ParallelAgent:
     """创建并行分析系统 - 并行执行模式"""
     load_dotenv(override=True)
     return ParallelAgent(
         name="并行投资分析",
         sub_agents=[
-            create_stock_analyst(),
-            create_fund_analyst(),
-            create_risk_analyst(),
-            create_market_analyst()
+            create_stock_analyst(tiering),
+            create_fund_analyst(tiering),
+            create_risk_analyst(tiering),
+            create_market_analyst(tiering)
         ]
     )
 
-root_agent = create_financial_analysis_team()
\ No newline at end of file
+root_agent = create_routed_analysis_team()
\ No newline at end of file
@@ -46,7 +46,7 @@ class PromptOptimizationSession:
 # --- 核心智能体 ---
 class PromptEngineerAgent:
     def __init__(self):
-        self.model = setup_model()
+        self.model = setup_model("金融提示词优化专家")
         self.sessions: Dict[str, PromptOptimizationSession] = {}
         self.session_service = InMemorySessionService()
         self.agent = self._create_root_agent()